@@ -1,9 +1,11 @@
 import random
 import time
+from array import array
+from collections import deque
+from itertools import islice
 from curses import wrapper
 from curses import window
 import curses
-from datetime import datetime
 
 class Snake:
     """
@@ -18,19 +20,38 @@ class Snake:
     chars : tuple[str]
         characters to represent the
         (head, horizontal segments, vertical segments, tail)
+    seg_dist : deque[int]
+        each segment's distance from the head, starting with the head's;
+        every distance but the head's is stored less seg_offset
+    seg_offset : int
+        added to every stored distance but the head's, so one step shifts
+        all of the segments at once
+    seg_dir : deque[int]
+        each segment's direction as an index into directions, parallel to
+        seg_dist
     segments : list[list[int, str]]
-        a list of each segment's distance from the head and current direction
+        a list of each segment's distance from the head and current direction,
+        built fresh from seg_dist, seg_offset and seg_dir on every access;
+        editing the returned list does not change the snake, but assigning
+        a new list to segments replaces all of them (a World holding the
+        snake must then be redrawn with World.resync())
     
     Methods
     -------
     turn(direction):
         Changes the heading of the snake.
+    distances():
+        Returns each segment's distance from the head.
     grow(length : int = 1):
         Adds legnth to the snake's tail.
     """
+
+    # headings are stored as their index here, so moving needs no hashing
+    directions = ('N', 'S', 'E', 'W')
+    direction_index = {d: k for k, d in enumerate(directions)}
     
     def __init__(
-            self, length, segments: list[list[int, str]] = [[0, 'E']],
+            self, length, segments: list[list[int, str]] | None = None,
             chars: tuple[str] = ('X','-','|','x')
         ):
         """
@@ -51,8 +72,9 @@ class Snake:
         """
         self.length = length
         self.chars = chars
-        # create a list of semgments, each with a distance from the snake's
-        # head and a direction; ordered starting with the head
+        if segments is None:    # a fresh list, never shared between snakes
+            segments = [[0, 'E']]
+        # a new snake's segments must begin before its tail
         for seg in segments:
             if seg[0] >= self.length - 1:
                 raise Exception("Snake segments must begin before the tail")
@@ -60,7 +82,43 @@ class Snake:
         
     def __repr__(self):
         return f"Snake of length {self.length} " \
-            f"traveling {self.segments[0][1]}"
+            f"traveling {self.directions[self.seg_dir[0]]}"
+
+    @property
+    def segments(self):
+        """A snapshot of each segment's [distance, direction], head first"""
+        return [
+            [dist, self.directions[direction]]
+            for dist, direction in zip(self.distances(), self.seg_dir)
+            ]
+
+    @segments.setter
+    def segments(self, segments: list[list[int, str]]):
+        """
+        Replaces every segment with the given [distance, direction]s; call
+        World.resync() afterwards if the snake is in a world
+        """
+        # create a list of semgments, each with a distance from the snake's
+        # head and a direction; ordered starting with the head. Stepping can
+        # leave the last segment on the tail itself, so only segments past
+        # the tail are rejected
+        for seg in segments:
+            if seg[0] >= self.length:
+                raise Exception("Snake segments must begin within the snake")
+        # distances and directions live in parallel deques rather than a
+        # list of small lists, so turning adds to the front in constant time
+        self.seg_dist = deque(seg[0] for seg in segments)
+        self.seg_offset = 0
+        self.seg_dir = deque(
+            self.direction_index[seg[1]] for seg in segments
+            )
+
+    def distances(self):
+        """Returns each segment's distance from the head, head first"""
+        offset = self.seg_offset
+        return [self.seg_dist[0]] + [
+            dist + offset for dist in islice(self.seg_dist, 1, None)
+            ]
     
     def turn(self, direction):
         """
@@ -80,8 +138,11 @@ class Snake:
         None
         """
 
-        # place a new segment at -1 so that the next step makes it the head
-        self.segments.insert(0, [-1, direction])
+        # the old head joins the offset segments, then place a new segment at
+        # -1 so that the next step makes it the head
+        self.seg_dist[0] -= self.seg_offset
+        self.seg_dist.appendleft(-1)
+        self.seg_dir.appendleft(self.direction_index[direction])
 
     def grow(self, length: int = 1):
         """Adds length to the snake's tail"""
@@ -92,12 +153,13 @@ class Snake:
 class World:
     """A world containing the snake and food."""
 
-    matrix_moves = {       
-        'N' : (-1, 0),      # translates the heading of the segment into
-        'S' : (1, 0),       # matrix steps
-        'E' : (0, 1),
-        'W' : (0, -1)
-    }
+    matrix_moves = (        # translates the heading of the segment into
+        (-1, 0),            # matrix steps, indexed like Snake.directions
+        (1, 0),
+        (0, 1),
+        (0, -1)
+    )
+    empty = ord(' ')    # byte stored in an unoccupied cell
     
     def __init__(
             self, snake: Snake, pos: list[int] | None = None,
@@ -117,97 +179,160 @@ class World:
             j_init = width // 4
             self.pos = [i_init, j_init]
         if self.pos[1] < self.snake.length - 1:
-            raise Exception(f"Snake of length {self.snake.length} is too " /
+            raise Exception(f"Snake of length {self.snake.length} is too "
                             f"long to start at column {self.pos[1]}")
         self.height = height
         self.width = width
         self.foodchar = foodchar
-        # populate world
-        self.data = [[]]
-        self.gen()
-        self.insertSnake()
-        self.placeFood()
+        # the room is one flat ASCII buffer of height * width bytes, so
+        # cell (i, j) lives at index i * width + j
+        self.snake_codes = ''.join(self.snake.chars).encode('ascii')
+        self.foodcode = ord(self.foodchar)
+        # the body byte for each heading, indexed like Snake.directions
+        self.seg_codes = bytes((
+            self.snake_codes[2], self.snake_codes[2],
+            self.snake_codes[1], self.snake_codes[1]
+            ))
+        # steps are drawn incrementally, so track the cell the head last
+        # moved onto and growth that has not reached the tail
+        self.head_cell = self.empty
+        self.growth = 0
+        # populate world; the snake is only drawn in full here and in resync
+        self.resync()
 
     def __repr__(self):
-        self.clearSnake()
-        self.insertSnake()
         data = self.data
-        s = ''
-        s += 'W' * (self.width + 2) + '\n'
-        for row in data:
-            s += 'W'
-            for cell in row:
-                s += cell
-            s += 'W\n'
-        s += 'W' * (self.width + 2)
-        return s
+        w = self.width
+        rows = [data[start:start + w] for start in range(0, len(data), w)]
+        border = b'W' * (w + 2)
+        # the walls between rows are the join separator, so the board is
+        # assembled and decoded in one pass each
+        board = b''.join((border, b'\nW', b'W\nW'.join(rows), b'W\n', border))
+        return board.decode('ascii')
+
+    def resync(self):
+        """
+        Rebuilds the room around the snake's current segments and places new
+        food. Call this after assigning to snake.segments, since steps only
+        redraw the cells they change.
+        """
+        self.gen()
+        self.insertSnake()
+        # insertSnake draws the snake's full length, growth included
+        self.head_cell = self.empty
+        self.growth = 0
+        self.placeFood()
 
     def gen(self):
-        """Generate an empty room"""
-        self.data = [
-            [' ' for cell in range(self.width)]
-            for row in range(self.height)
-            ]
+        """Generate an empty room, with no snake and every cell free"""
+        size = self.height * self.width
+        self.data = bytearray(b' ' * size)
+        # every cell of the snake behind its head, from the tail forward,
+        # with the same cells as one bitmask per row (bit j of row i is set
+        # when the body covers cell (i, j)) for single-bit collision checks
+        self.body = deque()
+        self.body_bits = [0] * self.height
+        # the flat index of every cell holding neither the snake nor food,
+        # kept up to date by step and placeFood; free_slot gives each free
+        # cell's position in free_cells (-1 when taken) so a cell can be
+        # added, removed or drawn at random in constant time
+        self.free_cells = list(range(size))
+        self.free_slot = array('i', range(size))
 
     def insertSnake(self):
-        """Puts the snake in the appropriate cells in self.data"""
-        # a 2-d pointer that will move along the snake
-        chars = self.snake.chars
-        # copy it so changing pointer does not change self.pos
+        """
+        Puts the snake in the appropriate cells in self.data, marking them
+        as taken; the room should be freshly generated
+        """
+        chars = self.snake_codes
+        data = self.data
+        h = self.height
+        w = self.width
+        # a 2-d pointer that will move along the snake; copy it so changing
+        # pointer does not change self.pos
         pointer = [self.pos[0], self.pos[1]]
-        segs = self.snake.segments
-        for i in range(len(segs)):  # segment indices 
-            direction = segs[i][1]
-            if direction in ('E', 'W'): char = chars[1]
-            else: char = chars[2]
+        pieces = []     # the cell of every piece, from the head back
+        dists = self.snake.distances()
+        dirs = list(self.snake.seg_dir)
+        for i in range(len(dists)):  # segment indices 
+            direction = dirs[i]
+            # every piece of a segment shares its character and heading
+            char = self.seg_codes[direction]
+            di, dj = self.matrix_moves[direction]
             # the following definition of segment length only works when not
             # on the last segment, because the snake has no defined tail
-            if i < len(segs) - 1:
-                seg_length = segs[i+1][0] - segs[i][0]
+            if i < len(dists) - 1:
+                seg_length = dists[i+1] - dists[i]
             else:
-                seg_length = self.snake.length - segs[i][0]
-            for j in range(seg_length):     # for each piece of the seg
-                if (
-                    pointer[0] not in range(self.height)
-                    or pointer[1] not in range(self.width)
-                    ):
-                    raise Exception("Snake is out of bounds")
-                # insert the piece
-                self.data[pointer[0]][pointer[1]] = char
-                # then update the pointer to move opposite the heading of
-                # the segment
-                move = self.matrix_moves[direction]
-                pointer[0] -= move[0]; pointer[1] -= move[1]
-        # do the opposite of the final step of the loops to
-        # move the pointer back to the tail;
-        # it is 1 move away as it moved after drawing the final piece
-        pointer[0] += move[0]; pointer[1] += move[1]
+                seg_length = self.snake.length - dists[i]
+            if seg_length <= 0:
+                continue
+            # a segment is a straight run of cells, so it is in bounds
+            # exactly when both of its ends are
+            end = [pointer[0] - di * (seg_length - 1),
+                   pointer[1] - dj * (seg_length - 1)]
+            if not (
+                0 <= pointer[0] < h and 0 <= pointer[1] < w
+                and 0 <= end[0] < h and 0 <= end[1] < w
+                ):
+                raise Exception("Snake is out of bounds")
+            # insert the whole segment with one strided slice assignment:
+            # a stride of 1 runs along a row and a stride of w down a column
+            stride = abs(di * w + dj)
+            first = min(pointer[0] * w + pointer[1], end[0] * w + end[1])
+            data[first:first + stride * seg_length:stride] = \
+                bytes((char,)) * seg_length
+            pieces.extend(
+                (pointer[0] - di * k, pointer[1] - dj * k)
+                for k in range(seg_length)
+                )
+            # then move the pointer past the end of the segment, opposite
+            # its heading
+            pointer = [end[0] - di, end[1] - dj]
+        self.body = deque(reversed(pieces[1:]))
+        self.body_bits = [0] * h
+        for i, j in self.body:
+            self.body_bits[i] |= 1 << j
+        for i, j in pieces:
+            self.takeCell(i * w + j)
         # the head and tail pieces of the snake are drawn as parts of their
         # segments, so they need to be overwritten
-        self.data[pointer[0]][pointer[1]] = chars[3]
+        tail = pieces[-1]
+        data[tail[0] * w + tail[1]] = chars[3]
         # self.pos is defined to be the head's position
-        self.data[self.pos[0]][self.pos[1]] = chars[0]
+        data[self.pos[0] * w + self.pos[1]] = chars[0]
 
-    def clearSnake(self):
-        """Removes the snake from the room, leaving an empty room with food"""
-        self.data = [
-            [cell if cell not in self.snake.chars else ' ' for cell in row]
-            for row in self.data
-            ]
+    def freeCell(self, k: int):
+        """Marks the cell at flat index k as free"""
+        self.free_slot[k] = len(self.free_cells)
+        self.free_cells.append(k)
 
-    def placeFood(self):
+    def takeCell(self, k: int):
+        """Marks the cell at flat index k as taken, if it was free"""
+        slot = self.free_slot[k]
+        if slot < 0:
+            return
+        # fill the hole with the last free cell instead of shifting the list
+        last = self.free_cells.pop()
+        if last != k:
+            self.free_cells[slot] = last
+            self.free_slot[last] = slot
+        self.free_slot[k] = -1
+
+    def placeFood(self, count: int = 1):
         """
-        Inserts one piece of food at a random location not occupied by the
-        snake.
+        Inserts count pieces of food (default is 1) at random locations not
+        occupied by the snake or other food, as many as there is room for.
+        Returns the flat indices of the cells that received food.
         """
 
-        while True:
-            i = random.choice(range(self.height))
-            j = random.choice(range(self.width))
-            # only place and exit once the cell is unoccupied
-            if self.data[i][j] == ' ':
-                self.data[i][j] = self.foodchar
-                break
+        # draw every piece at once from the unoccupied cells
+        free = self.free_cells
+        placed = random.sample(free, min(count, len(free)))
+        for k in placed:
+            self.takeCell(k)
+            self.data[k] = self.foodcode
+        return placed
 
     def step(self):
         """
@@ -215,22 +340,71 @@ class World:
         the head, then moving the head in the direction it is facing.
         """
 
-        if self.snake.segments[0][0] == -1: # if the snake just turned,
+        snake = self.snake
+        dists = snake.seg_dist
+        dirs = snake.seg_dir
+        if dists[0] == -1: # if the snake just turned,
             # then create the new head, and now the next
             # statement shifts the old one as well
-            self.snake.segments[0][0] += 1
-        # shift all of the segments but the head
-        for i in range(1, len(self.snake.segments)):
-            self.snake.segments[i][0] += 1
-            if self.snake.segments[i][0] >= self.snake.length:
-                del self.snake.segments[i]
+            dists[0] += 1
+        # shift all of the segments but the head with a single add
+        snake.seg_offset += 1
+        offset = snake.seg_offset
+        # only the last segment can slide past the tail
+        if len(dists) > 1 and dists[-1] + offset >= snake.length:
+            dists.pop()
+            dirs.pop()
+        data = self.data
+        w = self.width
+        chars = self.snake_codes
+        body = self.body
+        bits = self.body_bits
+        pos = self.pos
+        prev_head = (pos[0], pos[1])
+        if self.growth:     # the tail holds still while the snake grows
+            self.growth -= 1
+        else:
+            # vacate the tail's cell; a snake of length 1 is only its head
+            tail = body.popleft() if body else prev_head
+            bits[tail[0]] &= ~(1 << tail[1])
+            self.freeCell(tail[0] * w + tail[1])
+            data[tail[0] * w + tail[1]] = self.empty
+        # the old head becomes the front of the body
+        if snake.length > 1:
+            body.append(prev_head)
+            bits[prev_head[0]] |= 1 << prev_head[1]
         # move the head in the direction it is facing
-        move = self.matrix_moves[self.snake.segments[0][1]]
-        self.pos[0] += move[0]; self.pos[1] += move[1]
+        move = self.matrix_moves[dirs[0]]
+        pos[0] += move[0]; pos[1] += move[1]
+        i, j = pos
+        if not (0 <= i < self.height and 0 <= j < w):
+            self.head_cell = None   # the head has left the room
+            return
+        self.head_cell = data[i * w + j]
+        self.takeCell(i * w + j)
+        # redraw only the cells that changed: the old head becomes part of
+        # the segment holding the piece right behind the head
+        if len(body) > 1:
+            if len(dists) > 1 and dists[1] + offset == 1:
+                direction = dirs[1]
+            else:
+                direction = dirs[0]
+            data[prev_head[0] * w + prev_head[1]] = self.seg_codes[direction]
+        if body:
+            data[body[0][0] * w + body[0][1]] = chars[3]
+        data[i * w + j] = chars[0]
+
+    def grow(self, length: int = 1):
+        """
+        Grows the snake by length, keeping its tail in place for that many
+        steps.
+        """
+        self.snake.grow(length)
+        self.growth += length
 
     def onFood(self):
         """Returns True if the snakes's head is on food"""
-        if self.data[self.pos[0]][self.pos[1]] == self.foodchar:
+        if self.head_cell == self.foodcode:
             return True
         else: return False
 
@@ -241,9 +415,9 @@ class World:
         """
 
         if (
-            self.pos[0] not in range(self.height)
-            or self.pos[1] not in range(self.width)
-            or self.data[self.pos[0]][self.pos[1]] in self.snake.chars[1:]
+            not 0 <= self.pos[0] < self.height
+            or not 0 <= self.pos[1] < self.width
+            or (self.body_bits[self.pos[0]] >> self.pos[1]) & 1
         ):
             return True
         else: return False
@@ -255,7 +429,6 @@ class World:
         """
         global screen
         interval = 1 / speed    # period = frequency ** -1
-        curses.halfdelay(int(interval * 10))
         key_to_direction = {
             'w' : 'N',
             'a' : 'W',
@@ -263,37 +436,57 @@ class World:
             'd' : 'E'
         }
         food_eaten = 0
-        while not self.loss():  # Maybe change to while True (other check)
-            # print(self)
-            screen.clear()
-            screen.addstr(str(self))
-            # make sure the key waits for interval
-            try:
-                time_before = datetime.now()
-                key = screen.getkey()
-                time_after = datetime.now()
-                duration = time_after - time_before
-                time.sleep(interval - duration.seconds)
-            except:
-                key = None
-            if key in ('w', 'a', 's', 'd'):
+        won = False
+        # draw the whole board once; after that only changed cells are
+        # rewritten, and curses sends just those to the terminal
+        screen.clear()
+        screen.addstr(0, 0, str(self))
+        # a new world is never lost, so the check after each step is the
+        # only one needed
+        while True:
+            frame_end = time.perf_counter() + interval
+            # waiting for keys is the frame's delay: poll until the frame
+            # is over, keeping the latest direction key
+            key = None
+            while (remaining := frame_end - time.perf_counter()) > 0:
+                screen.timeout(max(1, round(remaining * 1000)))
+                try:
+                    pressed = screen.getkey()
+                except curses.error:    # no key before the frame ended
+                    break
+                if pressed in key_to_direction:
+                    key = pressed
+            if key is not None:
                 direction = key_to_direction[key]
-                if direction != self.snake.segments[0][1]:
+                if direction != Snake.directions[self.snake.seg_dir[0]]:
                     self.snake.turn(direction)
+            # a step only rewrites the cells of the old and new head and
+            # tail, so those are all that need repainting
+            repaint = [(self.pos[0], self.pos[1])]
+            repaint.append(self.body[0] if self.body else repaint[0])
             self.step()
             if self.loss(): break
+            repaint.append((self.pos[0], self.pos[1]))
+            if self.body:
+                repaint.append(self.body[0])
             if self.onFood():
-                self.snake.grow()
+                self.grow()
                 food_eaten += 1
-                # remove the food that has just been eaten
-                # Make sure not to place the new food on the cell it was
-                # just eaten from
-                while self.onFood():
-                    self.data[self.pos[0]][self.pos[1]] = ' '
-                    self.placeFood()
+                # the head now covers the eaten food, so the new piece can
+                # not land on the same cell; with no room left for it, the
+                # snake has filled the world
+                placed = self.placeFood()
+                if not placed:
+                    won = True
+                    break
+                repaint.extend(divmod(k, self.width) for k in placed)
+            for i, j in repaint:
+                # offset by the top and left walls
+                screen.addch(i + 1, j + 1, self.data[i * self.width + j])
         # display the game over screen
         screen.clear()
-        screen.addstr("Game Over\nYour final length : " \
+        screen.addstr(("You Win" if won else "Game Over") \
+                      + "\nYour final length : " \
                       + str(self.snake.length) + "\nFood Eaten : " \
                         + str(food_eaten))
         screen.refresh()